@@ -1,31 +1,32 @@
-# swiss_unihockey_dashboard_stable.py
+# streamlit_app.py
 # -*- coding: utf-8 -*-
 """
 Stabiles Streamlit-Dashboard für Swiss Unihockey API v2
 - Ruhigere Fehlerausgabe (gesammelt & zusammengefasst)
 - Caching (TTL) + Retries mit Backoff
 - Einmal abrufen, in allen Tabs wiederverwenden
-- Saison wählbar, Auto-Refresh 30s
+- Parallele Abrufe (Thread-Pool) über eine gepoolte HTTP-Session
+- Saison wählbar, Auto-Refresh 30s, Liveticker als Fragment alle 10s (ruhige Spiele seltener, bis 60s)
 
 Start:
-    pip install streamlit requests streamlit-autorefresh
-    streamlit run swiss_unihockey_dashboard_stable.py
+    pip install streamlit requests streamlit-autorefresh requests-cache orjson  # letzte drei optional
+    streamlit run streamlit_app.py
+
+API-Zugriff, Caching und Parsing liegen in swissu.py; hier nur Konfiguration und UI.
 """
 
 from __future__ import annotations
 from typing import Any, Dict, List, Optional, Tuple
 import json
 import time
-import datetime as dt
-import hashlib
+from urllib.parse import urlparse
 
-import requests
-import pandas as pd
 import streamlit as st
 
-BASE_URL = "https://api-v2.swissunihockey.ch/api/"
-TIMEOUT = 12
-VERIFY_SSL = True
+from swissu import (
+    BASE_URL, CACHE_TTL, extract_team_context, get_game_events, get_rankings,
+    get_team, load_team_games, logo_image, parse_rankings_df, run_parallel, safe_get,
+)
 
 # ---------- Teams anpassen ----------
 MY_TEAMS: Dict[int, str] = {
@@ -35,215 +36,108 @@ MY_TEAMS: Dict[int, str] = {
 }
 
 REFRESH_MS = 30 * 1000  # 30 Sekunden
-CACHE_TTL = 20          # Sekunden
+LIVE_REFRESH_S = 10     # Liveticker-Fragment
+LIVE_MAX_POLL_S = 60    # Obergrenze des Event-Abrufs bei ruhigem Spiel
 
-# ---------- Fehler-Sammeln ----------
 if "error_log" not in st.session_state:
     st.session_state["error_log"] = []
 
-def log_error(msg: str):
-    # Max 5 Einträge behalten
-    st.session_state["error_log"].append({"t": dt.datetime.now().strftime("%H:%M:%S"), "msg": msg})
-    st.session_state["error_log"] = st.session_state["error_log"][-5:]
-
-# ---------- Utils ----------
-
-def current_season_guess() -> int:
-    today = dt.date.today()
-    return today.year if today.month >= 7 else today.year - 1
-
-def _cache_key(path: str, params: Optional[Dict[str, Any]]) -> str:
-    raw = path + "|" + json.dumps(params or {}, sort_keys=True, ensure_ascii=False)
-    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
-
-@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
-def cached_get(path: str, params: Optional[Dict[str, Any]]=None) -> Dict[str, Any]:
-    return _api_get_uncached(path, params)
-
-def _api_get_uncached(path: str, params: Optional[Dict[str, Any]]=None) -> Dict[str, Any]:
-    """GET mit 3 Retries, exponentiellem Backoff und sanfter Fehlerausgabe."""
-    url = path if path.startswith("http") else BASE_URL.rstrip("/") + "/" + path.lstrip("/")
-    headers = {"Accept": "application/json", "User-Agent": "SU-Streamlit/1.2"}
-    last_err = None
-    for attempt in range(1, 4):
-        try:
-            r = requests.get(url, params=params or {}, timeout=TIMEOUT, verify=VERIFY_SSL, headers=headers)
-            if r.status_code >= 400:
-                # Zeige nur zusammengefasste Fehlermeldung
-                snippet = ""
-                try:
-                    snippet = r.json()
-                except Exception:
-                    snippet = r.text[:200]
-                last_err = f"HTTP {r.status_code} {url} params={params} details={snippet}"
-                # 4xx retryt meist nicht viel, aber 429/408/409 ggf. kurz warten
-                if r.status_code in (408, 409, 429, 500, 502, 503, 504):
-                    time.sleep(0.6 * attempt)
-                    continue
-                break
-            return r.json()
-        except requests.RequestException as e:
-            last_err = f"Netzwerkfehler bei {url}: {e}"
-            time.sleep(0.5 * attempt)
-    if last_err:
-        log_error(last_err)
-    return {}
-
-def api_get(path: str, params: Optional[Dict[str, Any]]=None, use_cache: bool=True) -> Dict[str, Any]:
-    if use_cache:
-        return cached_get(path, params)
-    return _api_get_uncached(path, params)
-
-def safe_get(d: Any, path: List[Any], default: Any=None) -> Any:
-    cur = d
-    for p in path:
-        if isinstance(cur, dict) and p in cur:
-            cur = cur[p]
+# ---------- Darstellung ----------
+
+# Spaltenaufteilung einer Spielzeile: Logo | Heim | Logo | Gast | Datum + Resultat
+GAME_ROW_LAYOUT = (1, 5, 1, 5, 5)
+
+def render_game_row(r: Dict[str, Any]) -> None:
+    """Eine Spielzeile rendern; Datum, Resultat und Status in einem einzigen Markdown-Aufruf."""
+    cols = st.columns(GAME_ROW_LAYOUT)
+    if r["home_logo"]:
+        cols[0].image(logo_image(r["home_logo"]), width=40)
+    cols[1].markdown(f"**{r['home']}**")
+    if r["away_logo"]:
+        cols[2].image(logo_image(r["away_logo"]), width=40)
+    cols[3].markdown(f"**{r['away']}**")
+    result = f"**{r['result']}**" if r["result"] else ""
+    status = f" _{r['status_text']}_" if r["status_text"] else ""
+    cols[4].markdown(f"{r['when']}  \n{result}{status}")
+
+def _event_key(e: Dict[str, Any]) -> Any:
+    """Stabiler Schlüssel eines Ticker-Ereignisses: API-ID, sonst (Zeit, Text)."""
+    return e.get("id") or (e.get("minute") or e.get("time"), e.get("text") or e.get("message"))
+
+def _event_line(e: Dict[str, Any]) -> str:
+    return f"**{e.get('minute') or e.get('time') or ''}** – {e.get('text') or e.get('message') or ''}"
+
+def _poll_due(game_id: int) -> bool:
+    state = st.session_state.get(f"ticker_{game_id}")
+    return not state or time.monotonic() >= state["next_poll"]
+
+def _backoff(state: Dict[str, Any]) -> None:
+    state["interval"] = min(state["interval"] * 1.5, LIVE_MAX_POLL_S)
+    state["next_poll"] = time.monotonic() + state["interval"]
+
+def _ticker_markdown(game_id: int, entries: List[Dict[str, Any]]) -> str:
+    """Ticker-Markdown pro Spiel; neue Ereignisse als Toast. Unveränderte Zeilen werden nicht
+    neu verglichen/zusammengesetzt, sondern aus dem Session-State übernommen; Korrekturen bei
+    gleicher Event-ID ändern die Zeile und werden daher neu gerendert.
+    Ohne Änderung wächst das Abruf-Intervall (x1.5 bis LIVE_MAX_POLL_S), sonst zurück auf LIVE_REFRESH_S."""
+    state = st.session_state.get(f"ticker_{game_id}")
+    lines = tuple(_event_line(e) for e in entries)
+    if state and state["lines"] == lines:
+        _backoff(state)
+        return state["md"]
+    keys = tuple(_event_key(e) for e in entries)
+    # Neue Ereignisse über stabile Keys erkennen (nicht über die Listenlänge),
+    # damit Korrekturen/Umsortierungen weder doppeln noch verloren gehen
+    if state:
+        seen = set(state["keys"])
+        for k, line in zip(keys, lines):
+            if k not in seen:
+                st.toast(line)
+    md = "  \n".join(lines)
+    st.session_state[f"ticker_{game_id}"] = {"keys": keys, "lines": lines, "md": md,
+                                             "interval": LIVE_REFRESH_S,
+                                             "next_poll": time.monotonic() + LIVE_REFRESH_S}
+    return md
+
+@st.fragment(run_every=LIVE_REFRESH_S)
+def live_ticker(season: int) -> None:
+    """Liveticker als Fragment: läuft alle LIVE_REFRESH_S Sekunden neu, ohne das ganze Skript."""
+    games = dict(zip(MY_TEAMS, run_parallel(lambda tid: load_team_games(tid, season=season), list(MY_TEAMS))))
+    live_games: Dict[int, Dict[str, Any]] = {}
+    for team_id in MY_TEAMS:
+        rows = games[team_id]["rows"]
+        # Ein Durchlauf über alle Spiele statt nur den ersten Eintrag zu prüfen
+        g = next((r for r in rows if r["game_id"] and r["is_live"]), None)
+        if g:
+            live_games[team_id] = g
+    # Events nur für fällige Spiele abrufen; die übrigen zeigen den letzten Stand
+    due_ids = [gid for gid in dict.fromkeys(g["game_id"] for g in live_games.values()) if _poll_due(gid)]
+    for gid, events in zip(due_ids, run_parallel(get_game_events, due_ids)):
+        # Fehler ({} ohne "entries") nicht als leere Liste werten: sonst gelten danach alle Ereignisse als neu
+        if "entries" in events:
+            _ticker_markdown(gid, events["entries"] or [])
+        elif f"ticker_{gid}" in st.session_state:
+            # Fehlschlag zählt nicht als neues Ereignis: weiter zurückfahren statt Intervall zurücksetzen
+            _backoff(st.session_state[f"ticker_{gid}"])
+
+    for team_id, team_name in MY_TEAMS.items():
+        if not games[team_id]["rows"]:
+            continue
+        g = live_games.get(team_id)
+        if g:
+            st.success(f"Live: {g['home']} – {g['away']} | {g['result']}")
+            state = st.session_state.get(f"ticker_{g['game_id']}")
+            if state is None:
+                st.write("Ticker derzeit nicht abrufbar.")
+            elif not state["md"]:
+                st.write("Noch keine Ticker-Ereignisse.")
+            else:
+                # Alle Ereignisse in einem Markdown-Element statt ein Element pro Ereignis
+                st.markdown(state["md"])
         else:
-            return default
-    return cur
-
-# ---------- API Wrapper ----------
-
-def get_team(team_id: int) -> Dict[str, Any]:
-    return api_get(f"teams/{team_id}")
-
-
-def get_games_team(team_id: int, season: int, per_page: int=20, view: str="short") -> Dict[str, Any]:
-    """
-    Team-Spiele abrufen mit strengen Parametern:
-      1) mode=team (+ team_id, season, per_page, view) und – falls vorhanden – group/league/game_class
-      2) Fallback: mode=club (+ club_id) wenn Team keinem group zugeordnet ist
-      3) Fallback: mode=list (+ league/game_class/group) – breiter Abruf
-    """
-    # Versuche context zu ermitteln
-    info = get_team(team_id)
-    league = safe_get(info, ["league", "id"])
-    game_class = safe_get(info, ["game_class", "id"])
-    group = safe_get(info, ["group", "name"])
-    club_id = safe_get(info, ["club", "id"])
-
-    # 1) mode=team mit Kontext
-    params_team = {
-        "mode": "team",
-        "team_id": team_id,
-        "season": season,
-        "per_page": per_page,
-        "view": view,
-    }
-    # Nur setzen, wenn vorhanden – einige Gateways erwarten 'group'
-    if group: params_team["group"] = group
-    if league: params_team["league"] = league
-    if game_class: params_team["game_class"] = game_class
-
-    data = api_get("games", params_team)
-    if data.get("entries"):
-        data["_used_params"] = params_team
-        return data
-
-    # 2) Fallback: club
-    if club_id:
-        params_club = {
-            "mode": "club",
-            "club_id": club_id,
-            "season": season,
-            "per_page": per_page,
-            "view": view,
-        }
-        data = api_get("games", params_club)
-        if data.get("entries"):
-            data["_used_params"] = params_club
-            return data
-
-    # 3) Fallback: list
-    if league and game_class:
-        params_list = {
-            "mode": "list",
-            "season": season,
-            "league": league,
-            "game_class": game_class,
-            "view": "full",
-        }
-        if group: params_list["group"] = group
-        data = api_get("games", params_list)
-        if data.get("entries"):
-            data["_used_params"] = params_list
-            return data
-
-    # nichts gefunden
-    out = {"entries": []}
-    out["_used_params"] = params_team
-    return out
-
-
-def get_game_events(game_id: int) -> Dict[str, Any]:
-    return api_get(f"game_events/{game_id}")
-
-def get_rankings(season: int, league: Optional[int]=None, game_class: Optional[int]=None, group: Optional[str]=None) -> Dict[str, Any]:
-    params: Dict[str, Any] = {"season": season}
-    if league is not None: params["league"] = league
-    if game_class is not None: params["game_class"] = game_class
-    if group is not None: params["group"] = group
-    return api_get("rankings", params)
-
-# ---------- Ableitungen/Parsing ----------
-
-def extract_team_context(team_id: int, season:int) -> Tuple[Optional[int], Optional[int], Optional[str]]:
-    info = get_team(team_id)
-    league = safe_get(info, ["league", "id"])
-    game_class = safe_get(info, ["game_class", "id"])
-    group = safe_get(info, ["group", "name"])
-
-    if not league or not game_class or not group:
-        games = get_games_team(team_id, season=season, per_page=5, view="short")
-        for ent in games.get("entries", []) or []:
-            g = ent.get("game", {})
-            league = league or safe_get(g, ["league", "id"])
-            game_class = game_class or safe_get(g, ["game_class", "id"])
-            group = group or safe_get(g, ["group", "name"])
-            if league and game_class and group:
-                break
-    return league, game_class, group
-
-def parse_games_rows(data: Dict[str, Any]) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
-    for ent in data.get("entries", []) or []:
-        g = ent.get("game", {})
-        gid = g.get("id") or g.get("game_id") or ent.get("id")
-        rows.append({
-            "game_id": gid,
-            "date": g.get("date") or ent.get("date", ""),
-            "time": g.get("time", ""),
-            "home": safe_get(g, ["home_team", "name"], ""),
-            "home_logo": safe_get(g, ["home_team", "logo", "url"], None) or safe_get(g, ["home_team", "club_logo"], None),
-            "away": safe_get(g, ["away_team", "name"], ""),
-            "away_logo": safe_get(g, ["away_team", "logo", "url"], None) or safe_get(g, ["away_team", "club_logo"], None),
-            "result": g.get("result", "-"),
-            "status_text": safe_get(g, ["status", "text"], ""),
-            "status_id": safe_get(g, ["status", "id"], None),
-        })
-    return rows
-
-def parse_rankings_df(data: Dict[str, Any]) -> pd.DataFrame:
-    rows: List[Dict[str, Any]] = []
-    for e in data.get("entries", []) or []:
-        rows.append({
-            "Platz": e.get("rank"),
-            "Team": safe_get(e, ["team", "name"], e.get("team_name", "")),
-            "Spiele": e.get("games") or e.get("played"),
-            "Siege": e.get("wins"),
-            "Unentschieden": e.get("draws"),
-            "Niederlagen": e.get("losses"),
-            "Tore": e.get("goals_for"),
-            "Gegentore": e.get("goals_against"),
-            "Tordiff": e.get("goal_diff"),
-            "Punkte": e.get("points") or e.get("pts"),
-        })
-    df = pd.DataFrame(rows)
-    if not df.empty and "Platz" in df.columns:
-        df["Platz"] = pd.to_numeric(df["Platz"], errors="coerce")
-        df = df.sort_values("Platz", na_position="last")
-    return df
+            st.info(f"Aktuell kein Live-Spiel für {team_name}.")
+    if not live_games:
+        st.caption("Wenn ein Spiel live ist, erscheint hier automatisch der Ticker.")
 
 # ---------- Streamlit UI ----------
 
@@ -259,8 +153,8 @@ with st.sidebar:
     try:
         from streamlit_autorefresh import st_autorefresh
         st_autorefresh(interval=REFRESH_MS, key="refresh_key")
-        st.caption("🔁 Auto-Refresh aktiv (30 s)")
-    except Exception:
+        st.caption(f"🔁 Auto-Refresh aktiv ({REFRESH_MS // 1000} s)")
+    except ImportError:
         st.info("Optional: `pip install streamlit-autorefresh` für Auto-Refresh.")
 
 st.caption(f"Aktive Saison: **{season}**")
@@ -269,9 +163,12 @@ st.caption(f"Aktive Saison: **{season}**")
 games_cache: Dict[int, Dict[str, Any]] = {}
 team_meta: Dict[int, Dict[str, Any]] = {}
 
-for tid in MY_TEAMS.keys():
-    team_meta[tid] = get_team(tid)
-    games_cache[tid] = get_games_team(tid, season=season, per_page=30, view="short")
+def _prefetch_team(tid: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    return get_team(tid), load_team_games(tid, season=season)
+
+for tid, (meta, games) in zip(MY_TEAMS, run_parallel(_prefetch_team, list(MY_TEAMS))):
+    team_meta[tid] = meta
+    games_cache[tid] = games
 
 tab_spiele, tab_tabelle, tab_ticker, tab_logs = st.tabs(["📅 Spiele", "📊 Tabelle", "🎥 Liveticker", "🧾 Logs"])
 
@@ -280,76 +177,60 @@ with tab_spiele:
     for team_id, team_name in MY_TEAMS.items():
         st.subheader(team_name)
         data = games_cache.get(team_id, {}) or {}
-        rows = parse_games_rows(data)
+        rows = data.get("rows") or []
         if not rows:
             st.warning("Keine Spiele gefunden.")
+            diag: List[str] = []
             if team_meta.get(team_id):
-                st.caption(f"Team-Check: Name **{safe_get(team_meta[team_id], ['name'], '—')}**, "
-                           f"Liga {safe_get(team_meta[team_id], ['league','id'])}, "
-                           f"Klasse {safe_get(team_meta[team_id], ['game_class','id'])}, "
-                           f"Gruppe {safe_get(team_meta[team_id], ['group','name'])}")
-            if data.get("_used_params"):
-                st.caption(f"Verwendete Params: `{json.dumps(data['_used_params'])}`")
+                diag.append(f"Team-Check: Name **{safe_get(team_meta[team_id], ['name'], '—')}**, "
+                            f"Liga {safe_get(team_meta[team_id], ['league','id'])}, "
+                            f"Klasse {safe_get(team_meta[team_id], ['game_class','id'])}, "
+                            f"Gruppe {safe_get(team_meta[team_id], ['group','name'])}")
+            if data.get("used_params"):
+                diag.append(f"Verwendete Params: `{json.dumps(data['used_params'])}`")
+            if diag:
+                st.caption("  \n".join(diag))
             continue
         for r in rows[:8]:
-            cols = st.columns([1, 5, 1, 5, 3, 2])
-            if r["home_logo"]:
-                cols[0].image(r["home_logo"], width=40)
-            cols[1].markdown(f"**{r['home']}**")
-            if r["away_logo"]:
-                cols[2].image(r["away_logo"], width=40)
-            cols[3].markdown(f"**{r['away']}**")
-            cols[4].markdown(f"{r['date']} {r['time']}")
-            cols[5].markdown(f"{r['result']}  \n_{r['status_text']}_")
+            render_game_row(r)
 
 with tab_tabelle:
     st.header("Tabellen (Liga je Team)")
-    for team_id, team_name in MY_TEAMS.items():
-        st.subheader(team_name)
-        league = safe_get(team_meta[team_id], ["league", "id"])
-        game_class = safe_get(team_meta[team_id], ["game_class", "id"])
-        group = safe_get(team_meta[team_id], ["group", "name"])
-
-        if not (league and game_class and group):
-            league, game_class, group = extract_team_context(team_id, season=season)
-
-        if not (league and game_class and group):
-            st.warning("Konnte Liga-Parameter nicht vollständig ermitteln.")
-            continue
-
-        st.caption(f"Liga-Parameter: league={league}, game_class={game_class}, group={group}")
-        ranking_raw = get_rankings(season, league=league, game_class=game_class, group=group)
-        df = parse_rankings_df(ranking_raw)
-        if df.empty:
-            st.info("Keine Rankings gefunden oder unbekannte Struktur.")
-        else:
-            st.dataframe(df, use_container_width=True)
+    # Tabs werden immer alle gerendert: Tabellen nur auf Wunsch laden (spart Requests pro Rerun)
+    if not st.checkbox("Tabellen laden", value=False, key="load_rankings"):
+        st.caption("Tabellen werden erst nach Aktivierung abgerufen.")
+    else:
+        contexts: Dict[int, Tuple[Optional[int], Optional[int], Optional[str]]] = {}
+        for team_id in MY_TEAMS:
+            league = safe_get(team_meta[team_id], ["league", "id"])
+            game_class = safe_get(team_meta[team_id], ["game_class", "id"])
+            group = safe_get(team_meta[team_id], ["group", "name"])
+            if not (league and game_class and group):
+                league, game_class, group = extract_team_context(team_id, season=season)
+            contexts[team_id] = (league, game_class, group)
+
+        # Alle benötigten Tabellen in einer Welle laden (gleiche Liga nur einmal)
+        wanted = list(dict.fromkeys(c for c in contexts.values() if all(c)))
+        rankings = dict(zip(wanted, run_parallel(
+            lambda c: get_rankings(season, league=c[0], game_class=c[1], group=c[2]), wanted)))
+
+        for team_id, team_name in MY_TEAMS.items():
+            st.subheader(team_name)
+            league, game_class, group = contexts[team_id]
+            if not (league and game_class and group):
+                st.warning("Konnte Liga-Parameter nicht vollständig ermitteln.")
+                continue
+
+            st.caption(f"Liga-Parameter: league={league}, game_class={game_class}, group={group}")
+            df = parse_rankings_df(rankings[contexts[team_id]])
+            if df.empty:
+                st.info("Keine Rankings gefunden oder unbekannte Struktur.")
+            else:
+                st.dataframe(df, use_container_width=True)
 
 with tab_ticker:
     st.header("Liveticker")
-    any_live = False
-    for team_id, team_name in MY_TEAMS.items():
-        rows = parse_games_rows(games_cache.get(team_id, {}))
-        if not rows:
-            continue
-        g = rows[0]
-        is_live = (g["status_id"] == 2) or (isinstance(g["status_text"], str) and "live" in g["status_text"].lower())
-        if is_live and g["game_id"]:
-            any_live = True
-            st.success(f"Live: {g['home']} – {g['away']} | {g['result']}")
-            events = get_game_events(int(g["game_id"]))
-            entries = events.get("entries", [])
-            if not entries:
-                st.write("Noch keine Ticker-Ereignisse.")
-            else:
-                for e in entries:
-                    minute = e.get("minute") or e.get("time") or ""
-                    text = e.get("text") or e.get("message") or ""
-                    st.write(f"**{minute}** – {text}")
-        else:
-            st.info(f"Aktuell kein Live-Spiel für {team_name}.")
-    if not any_live:
-        st.caption("Wenn ein Spiel live ist, erscheint hier automatisch der Ticker.")
+    live_ticker(season)
 
 with tab_logs:
     st.header("Zusammengefasste Fehler/Diagnose")
@@ -368,4 +249,4 @@ with tab_logs:
         st.success("Keine Fehler protokolliert.")
 
 st.markdown("---")
-st.caption("Quelle: api-v2.swissunihockey.ch • Caching TTL 20s • Auto-Refresh 30s")
+st.caption(f"Quelle: {urlparse(BASE_URL).netloc} • Caching TTL {CACHE_TTL}s • Auto-Refresh {REFRESH_MS // 1000}s")
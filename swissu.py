@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""
+Swiss Unihockey API v2: HTTP-Session, Caching und Parsing für das Dashboard.
+Enthält keine UI-Aufrufe ausser dem Fehler-Log in st.session_state.
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import datetime as dt
+import hashlib
+import io
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from zoneinfo import ZoneInfo
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import pandas as pd
+import streamlit as st
+from PIL import Image
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+try:
+    # Optional: orjson parst Bytes deutlich schneller als die Standardbibliothek
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+BASE_URL = "https://api-v2.swissunihockey.ch/api/"
+TIMEOUT = 12
+RETRY_STATUS = (408, 409, 429, 500, 502, 503, 504)  # 4xx retryt meist nicht, diese schon
+VERIFY_SSL = True
+TZ = ZoneInfo("Europe/Zurich")  # Server (z. B. Streamlit Cloud) läuft meist in UTC
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_DIR = os.path.join(APP_DIR, "logos")
+DEFAULT_LOGO_KEY = "default"  # logos/default.png
+LOGO_PX = 80  # Vorskalierung lokaler Logos (2x Anzeigebreite 40 px)
+
+CACHE_TTL = 20          # Sekunden (Spiele/Resultate)
+STATIC_CACHE_TTL = 3600 # Team-Stammdaten ändern sich kaum
+RANKINGS_CACHE_TTL = 300
+LIVE_CACHE_TTL = 8      # Ticker-Ereignisse
+HTTP_CACHE_PATH = os.path.join(APP_DIR, ".http_cache")  # SQLite, nur mit requests-cache
+MAX_WORKERS = 8         # parallele API-Requests (< pool_maxsize der Session)
+MAX_VALIDATORS = 256    # gespeicherte ETag-Antworten (LRU), begrenzt den Speicher
+
+# ---------- Fehler-Sammeln ----------
+_error_lock = threading.Lock()  # log_error wird auch aus Prefetch-Threads aufgerufen
+
+def log_error(msg: str):
+    # Max 5 Einträge behalten (pro Session)
+    with _error_lock:
+        log = st.session_state.setdefault("error_log", [])
+        log.append({"t": dt.datetime.now(TZ).strftime("%H:%M:%S"), "msg": msg})
+        st.session_state["error_log"] = log[-5:]
+
+# ---------- Utils ----------
+
+def current_season_guess() -> int:
+    today = dt.datetime.now(TZ).date()
+    return today.year if today.month >= 7 else today.year - 1
+
+def api_url(path: str) -> str:
+    """Relativen API-Pfad auf BASE_URL (HTTPS) abbilden; absolute URLs unverändert."""
+    return path if path.startswith("http") else BASE_URL + path.lstrip("/")
+
+def _cache_key(path: str, params: Optional[Dict[str, Any]]) -> str:
+    raw = path + "|" + json.dumps(params or {}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _logo_key(name: str) -> str:
+    return unicodedata.normalize("NFC", (name or "").strip().lower())
+
+@st.cache_resource
+def _local_logos() -> Dict[str, str]:
+    """Einmaliger Scan von logos/: Teamname (klein) -> Pfad, statt os.path.exists pro Spiel und Rerun."""
+    try:
+        files = os.listdir(LOGO_DIR)
+    except OSError:
+        return {}
+    return {_logo_key(os.path.splitext(fn)[0]): os.path.join(LOGO_DIR, fn)
+            for fn in files if fn.lower().endswith(".png")}
+
+@st.cache_resource
+def _local_logo_images() -> Dict[str, bytes]:
+    """Lokale Logos einmal laden und verkleinern: Pfad -> PNG-Bytes (kein Disk-Read pro Rerun)."""
+    out: Dict[str, bytes] = {}
+    for path in _local_logos().values():
+        try:
+            with Image.open(path) as im:
+                im.thumbnail((LOGO_PX, LOGO_PX))
+                buf = io.BytesIO()
+                im.save(buf, "PNG")
+        except OSError:
+            continue
+        out[path] = buf.getvalue()
+    return out
+
+def logo_image(ref: str) -> Any:
+    """Logo-Referenz für st.image: vorskalierte Bytes für lokale Logos, sonst die URL."""
+    return _local_logo_images().get(ref, ref)
+
+def local_logo(team_name: str) -> Optional[str]:
+    """Lokales Logo (logos/<teamname klein>.png) oder default.png, sonst None."""
+    logos = _local_logos()
+    return logos.get(_logo_key(team_name)) or logos.get(DEFAULT_LOGO_KEY)
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Eine Session für alle API-Calls: Keep-Alive + Connection-Pool über Reruns hinweg.
+    Mit installiertem requests-cache zusätzlich ein Disk-Cache, der App-Neustarts überlebt."""
+    try:
+        import requests_cache
+        host = urlparse(BASE_URL).netloc
+        s = requests_cache.CachedSession(HTTP_CACHE_PATH, backend="sqlite", expire_after=CACHE_TTL,
+                                         # Alles sofort abgelaufen: die TTL-Stufen liegen allein bei st.cache_data
+                                         urls_expire_after={f"{host}/api/teams/*": 0,
+                                                            f"{host}/api/rankings*": 0,
+                                                            f"{host}/api/games*": 0,
+                                                            f"{host}/api/game_events/*": 0},
+                                         allowable_methods=("GET",), cache_control=False)
+    except ImportError:
+        s = requests.Session()
+    s.headers.update({"Accept": "application/json", "User-Agent": "SU-Streamlit/1.2"})
+    # 2 Retries mit exp. Backoff (0.3/0.6 s), Retry-After bei 429/503 wird respektiert
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=RETRY_STATUS,
+                  allowed_methods=frozenset({"GET"}), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+    # auch http://, da api_url absolute URLs unverändert durchreicht
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+_Validator = Tuple[Optional[str], Optional[str], Dict[str, Any]]
+
+@st.cache_resource
+def _validator_store() -> Tuple[threading.Lock, OrderedDict[str, _Validator]]:
+    """cache_key -> (ETag, Last-Modified, letzte Antwort) für bedingte GETs; LRU mit MAX_VALIDATORS."""
+    return threading.Lock(), OrderedDict()
+
+def _get_validator(key: str) -> Optional[_Validator]:
+    lock, store = _validator_store()
+    with lock:
+        prev = store.get(key)
+        if prev:
+            store.move_to_end(key)
+        return prev
+
+def _put_validator(key: str, entry: _Validator) -> None:
+    lock, store = _validator_store()
+    with lock:
+        store[key] = entry
+        store.move_to_end(key)
+        while len(store) > MAX_VALIDATORS:
+            store.popitem(last=False)
+
+class _EmptyResponse(Exception):
+    """Leere/fehlerhafte Antwort: wird geworfen, damit st.cache_data sie nicht cacht."""
+
+def _get_or_raise(path: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    data = _api_get_uncached(path, params)
+    if not data:
+        raise _EmptyResponse(path)
+    return data
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_get(path: str, params: Optional[Dict[str, Any]]=None) -> Dict[str, Any]:
+    return _get_or_raise(path, params)
+
+@st.cache_data(ttl=STATIC_CACHE_TTL, show_spinner=False)
+def cached_get_static(path: str, params: Optional[Dict[str, Any]]=None) -> Dict[str, Any]:
+    return _get_or_raise(path, params)
+
+@st.cache_data(ttl=RANKINGS_CACHE_TTL, show_spinner=False)
+def cached_get_rankings(path: str, params: Optional[Dict[str, Any]]=None) -> Dict[str, Any]:
+    return _get_or_raise(path, params)
+
+@st.cache_data(ttl=LIVE_CACHE_TTL, show_spinner=False)
+def cached_get_live(path: str, params: Optional[Dict[str, Any]]=None) -> Dict[str, Any]:
+    return _get_or_raise(path, params)
+
+# TTL-Stufen: je nach Änderungshäufigkeit der Daten
+_CACHED_GET = {"default": cached_get, "static": cached_get_static,
+               "rankings": cached_get_rankings, "live": cached_get_live}
+
+def _api_get_uncached(path: str, params: Optional[Dict[str, Any]]=None) -> Dict[str, Any]:
+    """GET mit sanfter Fehlerausgabe; Retries + exponentieller Backoff macht der Session-Adapter."""
+    key = _cache_key(path, params)
+    url = api_url(path)
+    session = get_session()
+    prev = _get_validator(key)
+    headers: Dict[str, str] = {}
+    if prev:
+        if prev[0]: headers["If-None-Match"] = prev[0]
+        if prev[1]: headers["If-Modified-Since"] = prev[1]
+    try:
+        r = session.get(url, params=params or {}, timeout=TIMEOUT, verify=VERIFY_SSL, headers=headers)
+        if r.status_code == 304 and prev:
+            return prev[2]
+        if r.status_code >= 400:
+            # Zeige nur zusammengefasste Fehlermeldung (Retries sind bereits erfolgt);
+            # Rohtext-Ausschnitt statt JSON parsen und wieder serialisieren
+            last_err = f"HTTP {r.status_code} {url} params={params} details={r.text[:200]}"
+        else:
+            # Direkt aus den Bytes parsen: spart Text-Dekodierung/Charset-Erkennung von r.json()
+            data = json_loads(r.content)
+            etag, last_mod = r.headers.get("ETag"), r.headers.get("Last-Modified")
+            if etag or last_mod:
+                _put_validator(key, (etag, last_mod, data))
+            return data
+    except ValueError as e:
+        # Ungültiges JSON/URL
+        last_err = f"Ungültige Antwort von {url}: {e}"
+    except requests.RequestException as e:
+        last_err = f"Netzwerkfehler bei {url}: {e}"
+    log_error(last_err)
+    return {}
+
+def api_get(path: str, params: Optional[Dict[str, Any]]=None, use_cache: bool=True,
+            tier: str="default") -> Dict[str, Any]:
+    if use_cache:
+        try:
+            return _CACHED_GET[tier](path, params)
+        except _EmptyResponse:
+            return {}
+    return _api_get_uncached(path, params)
+
+def safe_get(d: Any, path: List[Any], default: Any=None) -> Any:
+    cur = d
+    for p in path:
+        if isinstance(cur, dict) and p in cur:
+            cur = cur[p]
+        else:
+            return default
+    return cur
+
+# ---------- API Wrapper ----------
+
+def get_team(team_id: int) -> Dict[str, Any]:
+    return api_get(f"teams/{team_id}", tier="static")
+
+
+def get_games_team(team_id: int, season: int, per_page: int=20, view: str="short",
+                   use_cache: bool=True) -> Dict[str, Any]:
+    """
+    Team-Spiele abrufen mit strengen Parametern:
+      1) mode=team (+ team_id, season, per_page, view) und – falls vorhanden – group/league/game_class
+      2) Fallback: mode=club (+ club_id) wenn Team keinem group zugeordnet ist
+      3) Fallback: mode=list (+ league/game_class/group) – breiter Abruf
+    use_cache=False, wenn der Aufrufer selbst cacht (sonst stapeln sich die TTLs).
+    """
+    # Versuche context zu ermitteln
+    info = get_team(team_id)
+    league = safe_get(info, ["league", "id"])
+    game_class = safe_get(info, ["game_class", "id"])
+    group = safe_get(info, ["group", "name"])
+    club_id = safe_get(info, ["club", "id"])
+
+    # 1) mode=team mit Kontext
+    params_team = {
+        "mode": "team",
+        "team_id": team_id,
+        "season": season,
+        "per_page": per_page,
+        "view": view,
+    }
+    # Nur setzen, wenn vorhanden – einige Gateways erwarten 'group'
+    if group: params_team["group"] = group
+    if league: params_team["league"] = league
+    if game_class: params_team["game_class"] = game_class
+
+    data = api_get("games", params_team, use_cache=use_cache)
+    failed = not data  # {} = Fehler; leere "entries" = echte Antwort
+    if data.get("entries"):
+        return {**data, "_used_params": params_team}
+
+    # 2) Fallback: club
+    if club_id:
+        params_club = {
+            "mode": "club",
+            "club_id": club_id,
+            "season": season,
+            "per_page": per_page,
+            "view": view,
+        }
+        data = api_get("games", params_club, use_cache=use_cache)
+        failed = failed or not data
+        if data.get("entries"):
+            return {**data, "_used_params": params_club}
+
+    # 3) Fallback: list
+    if league and game_class:
+        params_list = {
+            "mode": "list",
+            "season": season,
+            "league": league,
+            "game_class": game_class,
+            "view": "full",
+        }
+        if group: params_list["group"] = group
+        data = api_get("games", params_list, use_cache=use_cache)
+        failed = failed or not data
+        if data.get("entries"):
+            return {**data, "_used_params": params_list}
+
+    # nichts gefunden; "_failed", wenn ein Abruf fehlschlug (Ergebnis evtl. unvollständig)
+    out = {"entries": []}
+    out["_used_params"] = params_team
+    if failed:
+        out["_failed"] = True
+    return out
+
+
+def get_game_events(game_id: int) -> Dict[str, Any]:
+    return api_get(f"game_events/{game_id}", tier="live")
+
+def get_rankings(season: int, league: Optional[int]=None, game_class: Optional[int]=None, group: Optional[str]=None) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"season": season}
+    if league is not None: params["league"] = league
+    if game_class is not None: params["game_class"] = game_class
+    if group is not None: params["group"] = group
+    return api_get("rankings", params, tier="rankings")
+
+@st.cache_resource
+def _executor() -> ThreadPoolExecutor:
+    """Ein Thread-Pool für alle Sessions und Reruns statt eines neuen Pools pro Aufruf."""
+    return ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="swissu")
+
+def run_parallel(fn: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+    """fn für alle items parallel ausführen (I/O-gebunden), Reihenfolge bleibt erhalten.
+    Jede Aufgabe übernimmt den Script-Kontext des Aufrufers, damit Cache & Session-State funktionieren."""
+    if len(items) <= 1:
+        # Kein Pool für 0/1 Aufgaben (häufig: ein einzelnes Live-Spiel)
+        return [fn(i) for i in items]
+    ctx = get_script_run_ctx()
+
+    def task(item: Any) -> Any:
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(item)
+
+    return list(_executor().map(task, items))
+
+# ---------- Ableitungen/Parsing ----------
+
+def extract_team_context(team_id: int, season:int) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+    info = get_team(team_id)
+    league = safe_get(info, ["league", "id"])
+    game_class = safe_get(info, ["game_class", "id"])
+    group = safe_get(info, ["group", "name"])
+
+    if not league or not game_class or not group:
+        # Bereits geladene (gecachte) Spiele wiederverwenden statt erneut abzurufen
+        for r in load_team_games(team_id, season=season)["rows"]:
+            league = league or r["league"]
+            game_class = game_class or r["game_class"]
+            group = group or r["group"]
+            if league and game_class and group:
+                break
+    return league, game_class, group
+
+def _fmt_date(value: str) -> str:
+    """ISO-Datum (YYYY-MM-DD) als TT.MM.JJJJ; andere Formate unverändert."""
+    try:
+        return dt.date.fromisoformat(value).strftime("%d.%m.%Y")
+    except (TypeError, ValueError):
+        return value or ""
+
+def _game_id(*candidates: Any) -> Optional[int]:
+    """Erste brauchbare Spiel-ID als int (akzeptiert int oder Ziffern-String), sonst None."""
+    for c in candidates:
+        if isinstance(c, int):
+            return c
+        if isinstance(c, str) and c.isdigit():
+            return int(c)
+    return None
+
+def parse_games_rows(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    api_logos: Dict[str, str] = {}  # Teamname -> Logo-URL, einmal pro Team aufgelöst
+    for ent in data.get("entries", []) or []:
+        g = ent.get("game", {})
+        gid = _game_id(g.get("id"), g.get("game_id"), ent.get("id"))
+        home = safe_get(g, ["home_team", "name"], "")
+        away = safe_get(g, ["away_team", "name"], "")
+        date = g.get("date") or ent.get("date", "")
+        time_ = g.get("time", "")
+        home_logo = safe_get(g, ["home_team", "logo", "url"], None) or safe_get(g, ["home_team", "club_logo"], None)
+        away_logo = safe_get(g, ["away_team", "logo", "url"], None) or safe_get(g, ["away_team", "club_logo"], None)
+        if home_logo: api_logos.setdefault(home, home_logo)
+        if away_logo: api_logos.setdefault(away, away_logo)
+        rows.append({
+            "game_id": gid,
+            "date": date,
+            "time": time_,
+            # Anzeige-String einmal beim (gecachten) Parsen bauen statt pro Render
+            "when": f"{_fmt_date(date)} {time_ or ''}".strip(),
+            "home": home,
+            "home_logo": home_logo,
+            "away": away,
+            "away_logo": away_logo,
+            "result": g.get("result", "-"),
+            "status_text": safe_get(g, ["status", "text"], ""),
+            "status_id": safe_get(g, ["status", "id"], None),
+            "league": safe_get(g, ["league", "id"]),
+            "game_class": safe_get(g, ["game_class", "id"]),
+            "group": safe_get(g, ["group", "name"]),
+        })
+    # Fehlende Logos: zuerst API-Logo desselben Teams aus anderen Spielen, dann lokal;
+    # Live-Status einmal hier statt bei jedem Render bestimmen
+    for r in rows:
+        r["is_live"] = is_live_row(r)
+        for side in ("home", "away"):
+            if not r[f"{side}_logo"]:
+                r[f"{side}_logo"] = api_logos.get(r[side]) or local_logo(r[side])
+    return rows
+
+def is_live_row(r: Dict[str, Any]) -> bool:
+    return (r["status_id"] == 2) or (isinstance(r["status_text"], str) and "live" in r["status_text"].lower())
+
+def _load_team_games(team_id: int, season: int, per_page: int) -> Dict[str, Any]:
+    # Einzige Cache-Stufe ist der Zeilen-Cache darüber; Live-Resultate höchstens CACHE_TTL alt
+    data = get_games_team(team_id, season=season, per_page=per_page, view="short", use_cache=False)
+    if data.get("_failed"):
+        raise _EmptyResponse("games")  # Fehlschlag nicht cachen (im Archiv sonst eine Stunde)
+    return {"rows": parse_games_rows(data), "used_params": data.get("_used_params")}
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _load_team_games_current(team_id: int, season: int, per_page: int) -> Dict[str, Any]:
+    return _load_team_games(team_id, season, per_page)
+
+@st.cache_data(ttl=STATIC_CACHE_TTL, show_spinner=False)
+def _load_team_games_archive(team_id: int, season: int, per_page: int) -> Dict[str, Any]:
+    return _load_team_games(team_id, season, per_page)
+
+def load_team_games(team_id: int, season: int, per_page: int=30) -> Dict[str, Any]:
+    """Spiele eines Teams holen und parsen; gecacht als schlanke Zeilen-Dicts statt Roh-JSON.
+    Abgeschlossene Saisons ändern sich nicht mehr und werden entsprechend länger gecacht."""
+    loader = _load_team_games_archive if season < current_season_guess() else _load_team_games_current
+    try:
+        return loader(team_id, season, per_page)
+    except _EmptyResponse:
+        return {"rows": [], "used_params": None}
+
+def parse_rankings_df(data: Dict[str, Any]) -> pd.DataFrame:
+    rows: List[Dict[str, Any]] = []
+    for e in data.get("entries", []) or []:
+        rows.append({
+            "Platz": e.get("rank"),
+            "Team": safe_get(e, ["team", "name"], e.get("team_name", "")),
+            "Spiele": e.get("games") or e.get("played"),
+            "Siege": e.get("wins"),
+            "Unentschieden": e.get("draws"),
+            "Niederlagen": e.get("losses"),
+            "Tore": e.get("goals_for"),
+            "Gegentore": e.get("goals_against"),
+            "Tordiff": e.get("goal_diff"),
+            "Punkte": e.get("points") or e.get("pts"),
+        })
+    df = pd.DataFrame(rows)
+    if not df.empty and "Platz" in df.columns:
+        df["Platz"] = pd.to_numeric(df["Platz"], errors="coerce")
+        df = df.sort_values("Platz", na_position="last")
+    return df
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# swissu.py liegt im Repo-Root (kein installiertes Paket)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Smoke-Tests für swissu.py: Parsing und HTTP-Schicht mit gemockter Session (kein Netz)."""
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import pytest
+import streamlit as st
+
+import swissu
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body: Any=None, headers: Optional[Dict[str, str]]=None):
+        self.status_code = status_code
+        self.content = b"" if body is None else json.dumps(body).encode()
+        self.text = self.content.decode()
+        self.headers = headers or {}
+
+
+class FakeSession:
+    """Liefert vorbereitete Antworten der Reihe nach und merkt sich die Request-Header."""
+
+    def __init__(self, responses: List[FakeResponse]):
+        self.responses = list(responses)
+        self.sent_headers: List[Dict[str, str]] = []
+
+    def get(self, url, params=None, timeout=None, verify=None, headers=None):
+        self.sent_headers.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+@pytest.fixture(autouse=True)
+def clean_caches(monkeypatch):
+    st.cache_data.clear()
+    swissu._validator_store.clear()
+    errors: List[str] = []
+    monkeypatch.setattr(swissu, "log_error", errors.append)
+    yield errors
+
+
+def use_session(monkeypatch, *responses: FakeResponse) -> FakeSession:
+    session = FakeSession(list(responses))
+    monkeypatch.setattr(swissu, "get_session", lambda: session)
+    return session
+
+
+def _game(gid: Any, home: str, away: str, home_logo: Optional[str]=None, status_id: int=1,
+          status_text: str="") -> Dict[str, Any]:
+    home_team: Dict[str, Any] = {"name": home}
+    if home_logo:
+        home_team["logo"] = {"url": home_logo}
+    return {"game": {"id": gid, "date": "2025-09-20", "time": "19:30", "result": "3:2",
+                     "home_team": home_team, "away_team": {"name": away},
+                     "status": {"id": status_id, "text": status_text}}}
+
+
+def test_parse_games_rows_fields():
+    data = {"entries": [
+        _game("123", "HC Rychenberg Winterthur", "Tigers Langnau", home_logo="https://x/hcr.png", status_id=2),
+        _game(456, "Unbekannt FC", "HC Rychenberg Winterthur", status_text="Live"),
+        _game(None, "Unbekannt FC", "Tigers Langnau"),
+    ]}
+    rows = swissu.parse_games_rows(data)
+
+    assert [r["game_id"] for r in rows] == [123, 456, None]
+    assert rows[0]["when"] == "20.09.2025 19:30"
+    assert [r["is_live"] for r in rows] == [True, True, False]
+    # API-Logo desselben Teams aus einem anderen Spiel
+    assert rows[1]["away_logo"] == "https://x/hcr.png"
+    # lokales Logo, sonst default.png
+    assert os.path.basename(rows[0]["away_logo"]) == "tigers langnau.png"
+    assert os.path.basename(rows[1]["home_logo"]) == "default.png"
+
+
+def test_uncached_get_reuses_body_on_304(monkeypatch):
+    body = {"entries": [{"id": 1}]}
+    session = use_session(monkeypatch,
+                          FakeResponse(200, body, {"ETag": '"v1"'}),
+                          FakeResponse(304))
+
+    assert swissu._api_get_uncached("teams/1") == body
+    assert swissu._api_get_uncached("teams/1") == body
+    assert session.sent_headers[1].get("If-None-Match") == '"v1"'
+
+
+def test_api_get_http_error_returns_empty_and_is_not_cached(monkeypatch, clean_caches):
+    body = {"entries": [{"id": 1}]}
+    use_session(monkeypatch, FakeResponse(503, {"error": "down"}), FakeResponse(200, body))
+
+    assert swissu.api_get("rankings", {"season": 2025}, tier="rankings") == {}
+    assert clean_caches and "HTTP 503" in clean_caches[0]
+    # Fehler wurde nicht gecacht: nächster Aufruf geht wieder ans (erholte) API
+    assert swissu.api_get("rankings", {"season": 2025}, tier="rankings") == body